@@ -64,9 +64,9 @@ def attack_closest_enemy_planet(state):
         return False
 
     source = max(my_planets, key=lambda p: p.num_ships)
-    closest = min(enemy_planets, key=lambda e: state.distance(source.ID, e.ID))
-
     if source.num_ships < 10:
         return False
 
+    closest, = state.nearest_planets(source.ID, owner=2)
+
     return issue_order(state, source.ID, closest.ID, source.num_ships / 2)
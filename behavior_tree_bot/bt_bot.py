@@ -6,20 +6,39 @@
 // starting point, or you can throw it out entirely and replace it with your
 // own.
 """
-import logging, traceback, sys, os, inspect
-logging.basicConfig(filename=__file__[:-3] +'.log', filemode='w', level=logging.DEBUG)
-currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+import logging, traceback, signal, sys, os
+# Behavior tree tracing: off (default), counters, full (ring buffer dumped on a crash) or log (DEBUG text log).
+TRACE_MODE = os.environ.get('BT_TRACE', 'off')
+# Set BT_PROFILE to a file prefix to profile every node for the whole game into <prefix>.json / .folded.
+PROFILE_PREFIX = os.environ.get('BT_PROFILE')
+# Set BT_TREE to a tree file from `python3 bt_bot.py --save-tree <path>` to load it instead of building the tree.
+TREE_PATH = os.environ.get('BT_TREE')
+logging.basicConfig(filename=__file__[:-3] +'.log', filemode='w',
+                    level=logging.DEBUG if TRACE_MODE == 'log' else logging.INFO)
+currentdir = os.path.dirname(os.path.abspath(__file__))
 parentdir = os.path.dirname(currentdir)
 sys.path.append(parentdir)
 
 from behavior_tree_bot.behaviors import *
 from behavior_tree_bot.checks import *
 from behavior_tree_bot.bt_nodes import Selector, Sequence, Action, Check, Inverter, AlwaysSucceed, LoopUntilFail
+from behavior_tree_bot.bt_nodes import set_trace_mode, dump_trace, trace_counters, execute_with_budget
 
-from planet_wars import PlanetWars, finish_turn
+from planet_wars import PlanetWars, read_turns, finish_turn
 
 
 def setup_behavior_tree():
+    if TREE_PATH:
+        from behavior_tree_bot.bt_spec import load_tree
+        tree = load_tree(TREE_PATH)
+    else:
+        tree = build_behavior_tree()
+    # Only written out when someone reads the DEBUG log; building the string is not free.
+    if logging.root.isEnabledFor(logging.DEBUG):
+        logging.debug('\n' + tree.tree_to_string())
+    return tree
+
+def build_behavior_tree():
     tree = None
     # tree = setup_behavior_tree1()              #default
     tree = setup_behavior_tree2()              #balanced; hybrid
@@ -47,7 +66,6 @@ def setup_behavior_tree1():
 
     root.child_nodes = [offensive_plan, spread_sequence, attack.copy()]
 
-    logging.info('\n' + root.tree_to_string())
     return root
 
 def setup_behavior_tree2():
@@ -79,31 +97,55 @@ def setup_behavior_tree2():
     
     root.child_nodes = [rush, expansion, safe_attack, reinforce, desperate_attack]
 
-    logging.info('\n' + root.tree_to_string())
     return root
 
+behavior_tree = None
+
+# PlayGame gives each turn 1000 ms (see run.py). The tree stops trying new branches after this much of it,
+# which leaves time for reading the turn, a leaf that is already running and finish_turn().
+TURN_BUDGET = 0.8
+
 # You don't need to change this function
 def do_turn(state):
-    behavior_tree.execute(planet_wars)
+    global behavior_tree
+    if behavior_tree is None:
+        behavior_tree = setup_behavior_tree()
+    execute_with_budget(behavior_tree, state, TURN_BUDGET)
 
 if __name__ == '__main__':
-    logging.basicConfig(filename=__file__[:-3] + '.log', filemode='w', level=logging.DEBUG)
+    if sys.argv[1:2] == ['--save-tree'] and len(sys.argv) == 3:
+        from behavior_tree_bot.bt_spec import save_tree
+        save_tree(build_behavior_tree(), sys.argv[2])
+        sys.exit(0)
 
+    set_trace_mode(TRACE_MODE)
     behavior_tree = setup_behavior_tree()
+    if PROFILE_PREFIX:
+        from behavior_tree_bot.bt_profile import Profiler
+        profiler = Profiler()
+        profiler.start()
+    # PlayGame.jar ends a game by killing the bots with SIGTERM, which would skip the end-of-game output below;
+    # turn it into SystemExit so the finally block still runs.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     try:
-        map_data = ''
-        while True:
-            current_line = input()
-            if len(current_line) >= 2 and current_line.startswith("go"):
-                planet_wars = PlanetWars(map_data)
-                do_turn(planet_wars)
-                finish_turn()
-                map_data = ''
-            else:
-                map_data += current_line + '\n'
+        planet_wars = PlanetWars()
+        for turn in read_turns():
+            planet_wars.update(turn)
+            do_turn(planet_wars)
+            finish_turn(planet_wars)
 
     except KeyboardInterrupt:
         print('ctrl-c, leaving ...')
     except Exception:
         traceback.print_exc(file=sys.stdout)
         logging.exception("Error in bot.")
+        if TRACE_MODE == 'full':
+            logging.error('Last node visits before the crash:\n' + dump_trace())
+    finally:
+        if TRACE_MODE in ('counters', 'full'):
+            logging.info('Node visits / successes:\n' + '\n'.join('%s: %d / %d' % counter
+                                                                   for counter in trace_counters()))
+        if PROFILE_PREFIX:
+            profiler.stop()
+            profiler.write(behavior_tree, PROFILE_PREFIX)
+            logging.info('Profile:\n' + profiler.report(behavior_tree))
@@ -1,6 +1,57 @@
-from copy import deepcopy
+from collections import deque
+from copy import copy as shallow_copy, deepcopy
+from functools import partial, wraps
+from time import monotonic
 import logging
 
+
+CO_GENERATOR = 0x20
+
+def isgeneratorfunction(function):
+    # inspect.isgeneratorfunction without importing inspect, which takes longer than the rest of bt_bot's imports.
+    while isinstance(function, partial):
+        function = function.func
+    function = getattr(function, '__func__', function)
+    code = getattr(function, '__code__', None)
+    return code is not None and bool(code.co_flags & CO_GENERATOR)
+
+
+# Besides success (truthy) and failure (falsy), execute can return RUNNING: the node has not finished and
+# continues where it left off on the next tick. RUNNING is falsy, so code that only knows success and
+# failure reads it as "not succeeded (yet)".
+class Running:
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return 'RUNNING'
+
+RUNNING = Running()
+
+############################### Tracing ##################################
+# Node classes are defined with plain execute methods. set_trace_mode() swaps in one of the wrappers below
+# on every node class, so with tracing off (the default) a tick runs the undecorated methods and pays nothing.
+#   'off'      - no tracing
+#   'counters' - visits and successes per node object; a leaf shared between several places in the tree (see
+#                Node.copy) reports its visits from all of them together, bt_profile separates them by path
+#   'full'     - counters, plus (tick, node id, result) for each visit in a fixed-size ring buffer
+#   'log'      - the old DEBUG text log of every execute and its result
+TRACE_MODES = ('off', 'counters', 'full', 'log')
+
+
+class Trace:
+    def __init__(self):
+        self.mode = 'off'
+        self.tick = 0
+        self.depth = 0
+        self.counters = {}              # node -> [visits, successes]
+        self.buffer = deque(maxlen=4096)
+        self.nodes = {}                 # node id -> node, to name buffer entries when dumping
+
+trace = Trace()
+_node_classes = []
+
+
 def log_execution(fn):
     def logged_fn(self, state):
         logging.debug('Executing:' + str(self))
@@ -9,26 +60,189 @@ def log_execution(fn):
         return result
     return logged_fn
 
+
+def count_execution(fn):
+    def counted_fn(self, state):
+        result = fn(self, state)
+        counter = trace.counters.get(self)
+        if counter is None:
+            counter = trace.counters[self] = [0, 0]
+        counter[0] += 1
+        if result:
+            counter[1] += 1
+        return result
+    return counted_fn
+
+
+def record_execution(fn):
+    counted = count_execution(fn)
+
+    def recorded_fn(self, state):
+        if trace.depth == 0:
+            trace.tick += 1
+        trace.depth += 1
+        try:
+            result = counted(self, state)
+        finally:
+            trace.depth -= 1
+        trace.nodes[id(self)] = self
+        trace.buffer.append((trace.tick, id(self), result if result is RUNNING else bool(result)))
+        return result
+    return recorded_fn
+
+
+def instrument(wrapper):
+    # Replaces execute on every node class with wrapper(undecorated execute), or restores the plain methods
+    # when wrapper is None. Compiled trees (Node.compile) are never instrumented.
+    for cls in _node_classes:
+        cls.execute = cls.raw_execute if wrapper is None else wrapper(cls.raw_execute)
+
+
+def set_trace_mode(mode, buffer_size=4096):
+    if mode not in TRACE_MODES:
+        raise ValueError('Unknown trace mode: ' + str(mode))
+    instrument({'off': None, 'counters': count_execution, 'full': record_execution, 'log': log_execution}[mode])
+    trace.mode = mode
+    trace.tick = trace.depth = 0
+    trace.counters = {}
+    trace.buffer = deque(maxlen=buffer_size)
+    trace.nodes = {}
+
+
+def dump_trace():
+    # The ring buffer as text, oldest visit first. Children finish before their parents, so within a tick the
+    # root is the last line.
+    return '\n'.join('tick %d | %s -> %s' % (tick, trace.nodes[node_id],
+                                             'Running' if result is RUNNING else 'Success' if result else 'Failure')
+                     for tick, node_id, result in trace.buffer)
+
+
+def trace_counters():
+    # [(node, visits, successes)] for every node executed since tracing was turned on.
+    return [(node, visits, successes) for node, (visits, successes) in trace.counters.items()]
+
+############################### Time Budget ##################################
+# execute_with_budget() sets a monotonic deadline for one tick. While it is set, composites stop trying
+# further children once it has passed (Selector and Sequence fail, LoopUntilFail ends its loop), so the
+# bot still gets to finish_turn in time. A RUNNING child that the deadline stops them from resuming is
+# reset, closing its generator actions, so the next tick starts that subtree afresh. A single slow leaf
+# cannot be interrupted, so ticks that run past the budget anyway are recorded in budget.overruns as
+# (tick number, seconds).
+class Budget:
+    def __init__(self):
+        self.deadline = None
+        self.ticks = 0
+        self.overruns = []
+
+budget = Budget()
+
+
+def execute_with_budget(root, state, seconds):
+    # root is a node or a function from Node.compile().
+    tick = root.execute if isinstance(root, Node) else root
+    start = monotonic()
+    budget.deadline = start + seconds
+    budget.ticks += 1
+    try:
+        return tick(state)
+    finally:
+        budget.deadline = None
+        elapsed = monotonic() - start
+        if elapsed > seconds:
+            budget.overruns.append((budget.ticks, elapsed))
+            logging.warning('Tick %d took %.0f ms, over its %.0f ms budget', budget.ticks, elapsed * 1000,
+                            seconds * 1000)
+
+############################### Check Memoization ##################################
+# A check that declares which parts of the state it reads is evaluated at most once per tick for each
+# version of those parts. The state keeps check_cache (cleared every turn) and version, a counter per part
+# that planet_wars bumps when an order changes it:
+#   'owners' - who owns each planet (fixed within a turn)
+#   'ships'  - ships on planets
+#   'fleets' - fleets in flight
+def memoize_check(check_function, parts):
+    parts = tuple(parts)
+
+    @wraps(check_function)
+    def memoized(state):
+        cache = getattr(state, 'check_cache', None)
+        if cache is None:
+            return check_function(state)
+        version = state.version
+        key = tuple([version[part] for part in parts])
+        hit = cache.get(memoized)
+        if hit is not None and hit[0] == key:
+            return hit[1]
+        result = check_function(state)
+        cache[memoized] = (key, result)
+        return result
+    memoized.reads = parts
+    return memoized
+
+
+def reads(*parts):
+    # Decorator for check functions: @reads('owners', 'ships')
+    return lambda check_function: memoize_check(check_function, parts)
+
 ############################### Base Classes ##################################
 class Node:
     def __init__(self):
         raise NotImplementedError
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if 'execute' in cls.__dict__:
+            cls.raw_execute = cls.__dict__['execute']
+            _node_classes.append(cls)
+
     def execute(self, state):
         raise NotImplementedError
 
     def copy(self):
+        # Structural copy: composites and decorators are copied with fresh running state, while Check and plain
+        # Action leaves, which hold no state of their own, are shared between the original and the copy. Other
+        # node types get a deep copy unless they define copy() themselves.
         return deepcopy(self)
 
+    def reset(self):
+        # Abandons any work this node left RUNNING, so its next execute starts from the beginning. Composites
+        # call it on the child they were about to resume when the tick's deadline passes first.
+        pass
+
+    def compile(self):
+        # Returns a plain function(state) -> bool that gives the same results as execute, built from closures
+        # so a tick makes no per-node method dispatch and no logging. Compiled functions that keep running
+        # state carry a reset attribute, the counterpart of Node.reset; see reset_compiled.
+        raise NotImplementedError
+
+
+def reset_compiled(function):
+    reset = getattr(function, 'reset', None)
+    if reset is not None:
+        reset()
+
 ############################### Composite Base Class ##################################
 class Composite(Node):
-    def __init__(self, child_nodes=[], name=None):
-        self.child_nodes = child_nodes
+    running_child = 0   # index of the child that returned RUNNING, where the next tick resumes
+
+    def __init__(self, child_nodes=None, name=None):
+        self.child_nodes = [] if child_nodes is None else child_nodes
         self.name = name
 
     def execute(self, state):
         raise NotImplementedError
 
+    def copy(self):
+        clone = shallow_copy(self)
+        clone.child_nodes = [child_node.copy() for child_node in self.child_nodes]
+        clone.running_child = 0
+        return clone
+
+    def reset(self):
+        if self.child_nodes:
+            self.child_nodes[self.running_child].reset()
+        self.running_child = 0
+
     def __str__(self):
         return self.__class__.__name__ + ': ' + self.name if self.name else self.__class__.__name__
 
@@ -49,43 +263,186 @@ class Composite(Node):
 
 ############################### Composite Nodes ##################################
 class Selector(Composite):
-    @log_execution
     def execute(self, state):
-        for child_node in self.child_nodes:
-            if child_node.execute(state):
+        child_nodes = self.child_nodes
+        start, self.running_child = self.running_child, 0
+        for index in range(start, len(child_nodes)):
+            if budget.deadline is not None and monotonic() > budget.deadline:
+                if index == start:
+                    child_nodes[index].reset()
+                return False
+            result = child_nodes[index].execute(state)
+            if result is RUNNING:
+                self.running_child = index
+                return RUNNING
+            if result:
                 return True
         return False
 
+    def compile(self):
+        children = tuple(child_node.compile() for child_node in self.child_nodes)
+        running_child = 0
+
+        def selector(state):
+            nonlocal running_child
+            start, running_child = running_child, 0
+            for index in range(start, len(children)):
+                if budget.deadline is not None and monotonic() > budget.deadline:
+                    if index == start:
+                        reset_compiled(children[index])
+                    return False
+                result = children[index](state)
+                if result is RUNNING:
+                    running_child = index
+                    return RUNNING
+                if result:
+                    return True
+            return False
+
+        def reset():
+            nonlocal running_child
+            if children:
+                reset_compiled(children[running_child])
+            running_child = 0
+        selector.reset = reset
+        return selector
+
 class Sequence(Composite):
-    @log_execution
     def execute(self, state):
-        for child_node in self.child_nodes:
-            if not child_node.execute(state):
+        child_nodes = self.child_nodes
+        start, self.running_child = self.running_child, 0
+        for index in range(start, len(child_nodes)):
+            if budget.deadline is not None and monotonic() > budget.deadline:
+                if index == start:
+                    child_nodes[index].reset()
+                return False
+            result = child_nodes[index].execute(state)
+            if result is RUNNING:
+                self.running_child = index
+                return RUNNING
+            if not result:
                 return False
         return True
 
+    def compile(self):
+        children = tuple(child_node.compile() for child_node in self.child_nodes)
+        running_child = 0
+
+        def sequence(state):
+            nonlocal running_child
+            start, running_child = running_child, 0
+            for index in range(start, len(children)):
+                if budget.deadline is not None and monotonic() > budget.deadline:
+                    if index == start:
+                        reset_compiled(children[index])
+                    return False
+                result = children[index](state)
+                if result is RUNNING:
+                    running_child = index
+                    return RUNNING
+                if not result:
+                    return False
+            return True
+
+        def reset():
+            nonlocal running_child
+            if children:
+                reset_compiled(children[running_child])
+            running_child = 0
+        sequence.reset = reset
+        return sequence
+
 ############################### Leaf Nodes ##################################
 class Check(Node):
-    def __init__(self, check_function):
+    def __init__(self, check_function, reads=None):
+        # reads: the state parts the check depends on, if check_function was not declared with @reads.
+        if reads is not None:
+            check_function = memoize_check(check_function, reads)
         self.check_function = check_function
 
-    @log_execution
     def execute(self, state):
         return self.check_function(state)
 
+    def compile(self):
+        return self.check_function
+
+    def copy(self):
+        return self
+
     def __str__(self):
         return self.__class__.__name__ + ': ' + self.check_function.__name__
 
     def tree_to_string(self, indent=0, visited=None):
         return '| ' * indent + str(self) + '\n'
 
+def resume(generator, state):
+    # One step of a generator action: RUNNING while it yields, its return value once it is done.
+    try:
+        generator.send(state)
+    except StopIteration as done:
+        return done.value
+    return RUNNING
+
+
 class Action(Node):
+    # action_function may be a generator function, for work that is spread over several turns. Each yield
+    # ends the tick with RUNNING; on the next tick the yield evaluates to that tick's state and the action
+    # carries on. Its return value is the final success or failure.
+    generator = None
+
     def __init__(self, action_function):
         self.action_function = action_function
+        self.resumable = isgeneratorfunction(action_function)
 
-    @log_execution
     def execute(self, state):
-        return self.action_function(state)
+        if self.generator is None:
+            if not self.resumable:
+                return self.action_function(state)
+            self.generator = self.action_function(state)
+            result = resume(self.generator, None)
+        else:
+            result = resume(self.generator, state)
+        if result is not RUNNING:
+            self.generator = None
+        return result
+
+    def compile(self):
+        action_function = self.action_function
+        if not self.resumable:
+            return action_function
+        generator = None
+
+        def resumable_action(state):
+            nonlocal generator
+            if generator is None:
+                generator = action_function(state)
+                result = resume(generator, None)
+            else:
+                result = resume(generator, state)
+            if result is not RUNNING:
+                generator = None
+            return result
+
+        def reset():
+            nonlocal generator
+            if generator is not None:
+                generator.close()
+                generator = None
+        resumable_action.reset = reset
+        return resumable_action
+
+    def copy(self):
+        # A generator action keeps the generator it is running, so each copy needs its own node.
+        if not self.resumable:
+            return self
+        clone = shallow_copy(self)
+        clone.generator = None
+        return clone
+
+    def reset(self):
+        if self.generator is not None:
+            self.generator.close()
+            self.generator = None
 
     def __str__(self):
         return self.__class__.__name__ + ': ' + self.action_function.__name__
@@ -95,19 +452,68 @@ class Action(Node):
 
 ############################### Decorators ##################################
 class LoopUntilFail(Node):
+    running_count = 0   # iterations already done when the child returned RUNNING
+
     def __init__(self, child, max_iterations=10):
         self.child = child
         self.max_iterations = max_iterations
 
-    @log_execution
     def execute(self, state):
-        count = 0
+        start = count = self.running_count
+        self.running_count = 0
         while count < self.max_iterations:
-            if not self.child.execute(state):
+            if budget.deadline is not None and monotonic() > budget.deadline:
+                if count == start:
+                    self.child.reset()
+                return True
+            result = self.child.execute(state)
+            if result is RUNNING:
+                self.running_count = count
+                return RUNNING
+            if not result:
                 return True
             count += 1
         return True
 
+    def compile(self):
+        child, max_iterations = self.child.compile(), self.max_iterations
+        running_count = 0
+
+        def loop_until_fail(state):
+            nonlocal running_count
+            start = count = running_count
+            running_count = 0
+            while count < max_iterations:
+                if budget.deadline is not None and monotonic() > budget.deadline:
+                    if count == start:
+                        reset_compiled(child)
+                    break
+                result = child(state)
+                if result is RUNNING:
+                    running_count = count
+                    return RUNNING
+                if not result:
+                    break
+                count += 1
+            return True
+
+        def reset():
+            nonlocal running_count
+            reset_compiled(child)
+            running_count = 0
+        loop_until_fail.reset = reset
+        return loop_until_fail
+
+    def copy(self):
+        clone = shallow_copy(self)
+        clone.child = self.child.copy()
+        clone.running_count = 0
+        return clone
+
+    def reset(self):
+        self.child.reset()
+        self.running_count = 0
+
     def __str__(self):
         return f'LoopUntilFail (max {self.max_iterations})'
 
@@ -129,9 +535,26 @@ class Inverter(Node):
     def __init__(self, child):
         self.child = child
 
-    @log_execution
     def execute(self, state):
-        return not self.child.execute(state)
+        result = self.child.execute(state)
+        return RUNNING if result is RUNNING else not result
+
+    def compile(self):
+        child = self.child.compile()
+
+        def inverter(state):
+            result = child(state)
+            return RUNNING if result is RUNNING else not result
+        inverter.reset = partial(reset_compiled, child)
+        return inverter
+
+    def copy(self):
+        clone = shallow_copy(self)
+        clone.child = self.child.copy()
+        return clone
+
+    def reset(self):
+        self.child.reset()
 
     def __str__(self):
         return 'Inverter'
@@ -154,10 +577,24 @@ class AlwaysSucceed(Node):
     def __init__(self, child):
         self.child = child
 
-    @log_execution
     def execute(self, state):
-        self.child.execute(state)
-        return True
+        return RUNNING if self.child.execute(state) is RUNNING else True
+
+    def compile(self):
+        child = self.child.compile()
+
+        def always_succeed(state):
+            return RUNNING if child(state) is RUNNING else True
+        always_succeed.reset = partial(reset_compiled, child)
+        return always_succeed
+
+    def copy(self):
+        clone = shallow_copy(self)
+        clone.child = self.child.copy()
+        return clone
+
+    def reset(self):
+        self.child.reset()
 
     def __str__(self):
         return 'AlwaysSucceed'
@@ -0,0 +1,102 @@
+import json
+from time import perf_counter
+
+from behavior_tree_bot.bt_nodes import instrument
+
+
+def children(node):
+    if hasattr(node, 'child_nodes'):
+        return node.child_nodes
+    if hasattr(node, 'child'):
+        return [node.child]
+    return []
+
+
+class Profiler:
+    # Opt-in per-node profiler. While started it replaces the active trace mode and records, for every node,
+    # calls, successes, cumulative time (node and children) and self time (node only), across all ticks.
+    # Numbers are kept per position in the tree, the path of nodes from the root, because one leaf object can
+    # sit in several places (Node.copy() and bt_spec share Check and Action leaves). Only the same leaf twice
+    # under the same parent still adds up into one entry.
+    def __init__(self):
+        self.stats = {}         # tuple of nodes from the root -> [calls, successes, cumulative s, self s]
+        self.folded = {}        # tuple of nodes from the root -> self seconds, for collapsed stacks
+        self.stack = []
+        self.child_time = []
+
+    def start(self):
+        instrument(self.wrap)
+
+    def stop(self):
+        instrument(None)
+
+    def wrap(self, fn):
+        stack, child_time, stats, folded = self.stack, self.child_time, self.stats, self.folded
+
+        def profiled_fn(node, state):
+            stack.append(node)
+            child_time.append(0.0)
+            result = False
+            start = perf_counter()
+            try:
+                result = fn(node, state)
+                return result
+            finally:
+                elapsed = perf_counter() - start
+                own = elapsed - child_time.pop()
+                path = tuple(stack)
+                stack.pop()
+                if child_time:
+                    child_time[-1] += elapsed
+
+                node_stats = stats.get(path)
+                if node_stats is None:
+                    node_stats = stats[path] = [0, 0, 0.0, 0.0]
+                node_stats[0] += 1
+                node_stats[1] += 1 if result else 0
+                node_stats[2] += elapsed
+                node_stats[3] += own
+                folded[path] = folded.get(path, 0.0) + own
+        return profiled_fn
+
+    def node_stats(self, path):
+        calls, successes, cumulative, own = self.stats.get(path, (0, 0, 0.0, 0.0))
+        return {'name': str(path[-1]), 'calls': calls, 'successes': successes,
+                'success_rate': successes / calls if calls else None,
+                'cumulative_ms': cumulative * 1000, 'self_ms': own * 1000}
+
+    def to_dict(self, root, path=()):
+        # The tree's structure with each node's numbers, children nested like tree_to_string prints them.
+        path += (root,)
+        entry = self.node_stats(path)
+        entry['children'] = [self.to_dict(child, path) for child in children(root)]
+        return entry
+
+    def to_json(self, root, indent=1):
+        return json.dumps(self.to_dict(root), indent=indent)
+
+    def collapsed_stacks(self):
+        # One 'root;child;...;node microseconds' line per call path, the input format of flamegraph.pl and
+        # speedscope.
+        lines = []
+        for path, own in self.folded.items():
+            frames = ';'.join(str(node).replace(';', ',') for node in path)
+            lines.append('%s %d' % (frames, round(own * 1e6)))
+        return '\n'.join(lines) + '\n'
+
+    def report(self, root, indent=0, path=()):
+        # tree_to_string with calls, success rate and cumulative / self milliseconds on every line.
+        path += (root,)
+        stats = self.node_stats(path)
+        line = '| ' * indent + str(root)
+        if stats['calls']:
+            line = '%-60s %7d calls %5.1f%% ok %9.3f ms cum %9.3f ms self' % \
+                   (line, stats['calls'], 100 * stats['success_rate'], stats['cumulative_ms'], stats['self_ms'])
+        return line + '\n' + ''.join(self.report(child, indent + 1, path) for child in children(root))
+
+    def write(self, root, prefix):
+        # prefix.json and prefix.folded
+        with open(prefix + '.json', 'w') as f:
+            f.write(self.to_json(root))
+        with open(prefix + '.folded', 'w') as f:
+            f.write(self.collapsed_stacks())
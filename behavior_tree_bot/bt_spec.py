@@ -0,0 +1,78 @@
+import json
+
+from behavior_tree_bot.bt_nodes import Selector, Sequence, Check, Action, LoopUntilFail, Inverter, AlwaysSucceed
+from behavior_tree_bot.bt_nodes import Composite
+from behavior_tree_bot import behaviors, checks
+
+# Declarative trees: plain dicts (or the same thing as JSON) that name their leaves' functions from
+# behaviors.py and checks.py, e.g.
+#
+#   {"type": "Selector", "name": "Root", "children": [
+#       {"type": "Sequence", "children": [{"type": "Check", "function": "have_largest_fleet"},
+#                                         {"type": "Action", "function": "attack_closest_enemy_planet"}]},
+#       {"type": "LoopUntilFail", "max_iterations": 5,
+#        "child": {"type": "Action", "function": "spread_to_weakest_neutral_planet"}}]}
+
+COMPOSITES = {'Selector': Selector, 'Sequence': Sequence}
+DECORATORS = {'Inverter': Inverter, 'AlwaysSucceed': AlwaysSucceed, 'LoopUntilFail': LoopUntilFail}
+LEAVES = {'Check': Check, 'Action': Action}
+
+
+def functions(*modules):
+    # Name -> function for everything defined (not imported) in the given modules.
+    return {name: value for module in modules for name, value in vars(module).items()
+            if callable(value) and not name.startswith('_') and getattr(value, '__module__', None) == module.__name__}
+
+
+FUNCTIONS = functions(behaviors, checks)
+
+# Leaves are shared by every tree built from specs, so loading many variants builds each leaf once.
+_leaves = {}
+
+
+def tree_from_dict(spec, functions=None):
+    if functions is None:
+        functions = FUNCTIONS
+    node_type = spec['type']
+    if node_type in LEAVES:
+        key = (node_type, functions[spec['function']])
+        leaf = _leaves.get(key)
+        if leaf is None:
+            leaf = _leaves[key] = LEAVES[node_type](key[1])
+        # Generator actions keep running state, which copy() gives each placement of its own.
+        return leaf.copy()
+    if node_type in COMPOSITES:
+        return COMPOSITES[node_type]([tree_from_dict(child, functions) for child in spec['children']],
+                                     name=spec.get('name'))
+    if node_type == 'LoopUntilFail':
+        return LoopUntilFail(tree_from_dict(spec['child'], functions), spec.get('max_iterations', 10))
+    if node_type in DECORATORS:
+        return DECORATORS[node_type](tree_from_dict(spec['child'], functions))
+    raise ValueError('Unknown node type: %r' % node_type)
+
+
+def tree_to_dict(node):
+    node_type = type(node).__name__
+    if isinstance(node, Check):
+        return {'type': node_type, 'function': node.check_function.__name__}
+    if isinstance(node, Action):
+        return {'type': node_type, 'function': node.action_function.__name__}
+    if isinstance(node, Composite):
+        spec = {'type': node_type, 'children': [tree_to_dict(child) for child in node.child_nodes]}
+        if node.name:
+            spec['name'] = node.name
+        return spec
+    spec = {'type': node_type, 'child': tree_to_dict(node.child)}
+    if isinstance(node, LoopUntilFail):
+        spec['max_iterations'] = node.max_iterations
+    return spec
+
+
+def load_tree(path, functions=None):
+    with open(path) as f:
+        return tree_from_dict(json.load(f), functions)
+
+
+def save_tree(root, path):
+    with open(path, 'w') as f:
+        json.dump(tree_to_dict(root), f, indent=1)
@@ -1,28 +1,32 @@
+from behavior_tree_bot.bt_nodes import reads
 
 
+@reads('owners')
 def if_neutral_planet_available(state):
     return any(state.neutral_planets())
 
 
+@reads('ships', 'fleets')
 def have_largest_fleet(state):
-    return sum(planet.num_ships for planet in state.my_planets()) \
-             + sum(fleet.num_ships for fleet in state.my_fleets()) \
-           > sum(planet.num_ships for planet in state.enemy_planets()) \
-             + sum(fleet.num_ships for fleet in state.enemy_fleets())
+    return state.blackboard.total_ships(1) > state.blackboard.total_ships(2)
 
+@reads('owners')
 def have_more_planets_than_enemy(state):
     return len(state.my_planets()) > len(state.enemy_planets())
 
 
+@reads('ships', 'fleets')
 def is_enemy_stronger(state):
-    my_power = sum(p.num_ships for p in state.my_planets()) + sum(f.num_ships for f in state.my_fleets())
-    enemy_power = sum(p.num_ships for p in state.enemy_planets()) + sum(f.num_ships for f in state.enemy_fleets())
+    my_power = state.blackboard.total_ships(1)
+    enemy_power = state.blackboard.total_ships(2)
     return enemy_power > my_power
 
 
+@reads('owners', 'ships')
 def has_idle_planet(state):
     return any(p.num_ships > 30 for p in state.my_planets())
 
+@reads('owners')
 def is_enemy_too_far(state):
     my_planets = state.my_planets()
     enemy_planets = state.enemy_planets()
@@ -30,6 +34,5 @@ def is_enemy_too_far(state):
     if not my_planets or not enemy_planets:
         return True
 
-    min_dist = min(state.distance(m.ID, e.ID) for m in my_planets for e in enemy_planets
-    )
-    return min_dist > 10
+    # Too far when no enemy planet lies within 10 turns of any of ours.
+    return not any(state.planets_within(m.ID, 10, owner=2) for m in my_planets)
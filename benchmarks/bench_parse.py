@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+#
+# Per-turn parse latency of the engine protocol for late-game states with thousands of fleets.
+# Compares the old line-by-line reader and parser with read_turns() and the single-pass parser.
+#
+#   python3 benchmarks/bench_parse.py
+
+import io, os, sys, random, timeit
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parentdir)
+
+from planet_wars import PlanetWars, Planet, Fleet, read_turns
+
+
+def legacy_read(lines):
+    # The original bot loop: input() per line and string concatenation up to 'go'.
+    map_data = ''
+    for current_line in lines:
+        if len(current_line) >= 2 and current_line.startswith("go"):
+            return map_data
+        map_data += current_line + '\n'
+
+
+def legacy_parse(state):
+    # The original parse_game_state: split, filter twice, strip comments line by line.
+    planets, fleets = [], []
+    lines = state.split("\n")
+    planet_lines = [line for line in lines if line.startswith('P')]
+    fleet_lines = [line for line in lines if line.startswith('F')]
+    for planet_id, line in enumerate(planet_lines):
+        params = line.split('#')[0].split(' ')[1:]
+        planets.append(Planet(planet_id, *map(float, params)))
+    for line in fleet_lines:
+        params = line.split('#')[0].split(' ')[1:]
+        fleets.append(Fleet(*map(int, params)))
+    return planets, fleets
+
+
+def synthesize_turn(map_path, num_fleets, seed=0):
+    """ The map's planets with random owners and ship counts plus num_fleets fleets in flight. """
+    rng = random.Random(seed)
+    state = PlanetWars(open(map_path).read())
+    lines = ["P %r %r %d %d %d" % (p.x, p.y, rng.randint(0, 2), rng.randint(0, 500), p.growth_rate)
+             for p in state.planets]
+    for _ in range(num_fleets):
+        source, destination = rng.sample(range(len(state.planets)), 2)
+        total = state.distance(source, destination)
+        lines.append("F %d %d %d %d %d %d" % (rng.randint(1, 2), rng.randint(1, 200), source, destination,
+                                             total, rng.randint(1, total)))
+    return '\n'.join(lines) + '\ngo\n'
+
+
+def per_turn_ms(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1000
+
+
+if __name__ == '__main__':
+    map_path = os.path.join(parentdir, 'maps', 'map1.txt')
+    print('%8s %14s %14s %14s %14s' % ('fleets', 'old read+parse', 'new read+parse', 'new update', 'speedup'))
+    for num_fleets in (0, 100, 1000, 5000, 10000):
+        text = synthesize_turn(map_path, num_fleets)
+        lines = text.splitlines()
+        data = text.encode()
+        number = max(1, 2000 // (num_fleets + 20))
+
+        old = per_turn_ms(lambda: legacy_parse(legacy_read(lines)), number)
+        new = per_turn_ms(lambda: PlanetWars(next(read_turns(io.BytesIO(data)))), number)
+        state = PlanetWars(data[:-3])
+        update = per_turn_ms(lambda: state.update(next(read_turns(io.BytesIO(data)))), number)
+        print('%8d %11.3f ms %11.3f ms %11.3f ms %13.1fx' % (num_fleets, old, new, update, old / min(new, update)))
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+#
+# Memory and speed of the __slots__ Planet/Fleet records against the namedtuples they replaced.
+#
+#   python3 benchmarks/bench_records.py
+
+import os, sys, timeit, tracemalloc
+from collections import namedtuple
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parentdir)
+
+from planet_wars import Planet, Fleet
+
+OldFleet = namedtuple('Fleet', ['owner', 'num_ships', 'source_planet', 'destination_planet', 'total_trip_length',
+                                'turns_remaining'])
+OldPlanet = namedtuple('Planet', ['ID', 'x', 'y', 'owner', 'num_ships', 'growth_rate'])
+
+COUNT = 100000
+
+
+def memory_per_record(make):
+    tracemalloc.start()
+    records = [make(i) for i in range(COUNT)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return size / COUNT
+
+
+def per_call_ns(fn, number=200000):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e9
+
+
+def old_send(planet, fleets):
+    # What issue_order did with namedtuples: a new Fleet and a _replace'd Planet per order.
+    fleets.append(OldFleet(1, 10, planet.ID, 3, 7, 7))
+    return planet._replace(num_ships=planet.num_ships - 10)
+
+
+def new_send(planet, fleets):
+    fleets.append(Fleet(1, 10, planet.ID, 3, 7, 7))
+    planet.num_ships -= 10
+    return planet
+
+
+if __name__ == '__main__':
+    # Ship counts above the small-int cache, so each record owns its integers like in a real game.
+    rows = [
+        ('Fleet bytes/record', memory_per_record(lambda i: OldFleet(1, 1000 + i, 2, 3, 7, 5)),
+         memory_per_record(lambda i: Fleet(1, 1000 + i, 2, 3, 7, 5))),
+        ('Planet bytes/record', memory_per_record(lambda i: OldPlanet(i, 1.5 + i, 2.5, 1.0, 1000.0 + i, 5.0)),
+         memory_per_record(lambda i: Planet(i, 1.5 + i, 2.5, 1, 1000 + i, 5))),
+    ]
+
+    old_planet, new_planet = OldPlanet(0, 1.5, 2.5, 1.0, 10 ** 9, 5.0), Planet(0, 1.5, 2.5, 1, 10 ** 9, 5)
+    old_fleets, new_fleets = [], []
+    rows += [
+        ('Fleet construction ns', per_call_ns(lambda: OldFleet(1, 50, 2, 3, 7, 5)),
+         per_call_ns(lambda: Fleet(1, 50, 2, 3, 7, 5))),
+        ('num_ships read ns', per_call_ns(lambda: old_planet.num_ships), per_call_ns(lambda: new_planet.num_ships)),
+        ('ships update ns', per_call_ns(lambda: old_planet._replace(num_ships=old_planet.num_ships - 1)),
+         per_call_ns(lambda: setattr(new_planet, 'num_ships', new_planet.num_ships - 1))),
+        ('order (fleet + planet) ns', per_call_ns(lambda: old_send(old_planet, old_fleets), 100000),
+         per_call_ns(lambda: new_send(new_planet, new_fleets), 100000)),
+    ]
+
+    print('%-28s %12s %12s' % ('', 'namedtuple', '__slots__'))
+    for name, old, new in rows:
+        print('%-28s %12.1f %12.1f' % (name, old, new))
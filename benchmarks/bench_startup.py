@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+#
+# Time to first order for a freshly launched bt_bot.py, the way PlayGame.jar starts it for every game:
+# from process start until the bot answers its first turn with 'go'. Interpreter start-up alone is shown
+# for reference, next to the bot building its tree in code and loading a pre-built tree file (BT_TREE).
+#
+#   python3 benchmarks/bench_startup.py [runs]
+
+import os, subprocess, sys, tempfile, time
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOT = os.path.join(parentdir, 'behavior_tree_bot', 'bt_bot.py')
+
+
+def time_to_first_order(command, turn, env=None):
+    """ Seconds from launching command until it writes its 'go' line in reply to turn. """
+    start = time.perf_counter()
+    bot = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, cwd=parentdir,
+                           env=dict(os.environ, **(env or {})))
+    bot.stdin.write(turn)
+    bot.stdin.flush()
+    for line in bot.stdout:
+        if line.startswith(b'go'):
+            break
+    elapsed = time.perf_counter() - start
+    bot.stdin.close()
+    bot.wait()
+    return elapsed
+
+
+def summary(times):
+    times = sorted(times)
+    return '%8.1f ms %8.1f ms' % (times[0] * 1000, times[len(times) // 2] * 1000)
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with open(os.path.join(parentdir, 'maps', 'map1.txt'), 'rb') as f:
+        turn = f.read().rstrip(b'\n') + b'\ngo\n'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tree_path = os.path.join(tmp, 'tree.json')
+        subprocess.run([sys.executable, BOT, '--save-tree', tree_path], check=True, cwd=parentdir)
+
+        # A python that only echoes 'go': the floor no bot can get under.
+        echo = [sys.executable, '-c', 'import sys\nfor line in sys.stdin:\n    if line.startswith("go"): '
+                                      'print("go", flush=True)']
+        cases = [('interpreter only', echo, None),
+                 ('bt_bot.py', [sys.executable, BOT], None),
+                 ('bt_bot.py, BT_TREE', [sys.executable, BOT], {'BT_TREE': tree_path})]
+
+        print('%-20s %11s %11s' % ('', 'min', 'median'))
+        for name, command, env in cases:
+            times = [time_to_first_order(command, turn, env) for _ in range(runs)]
+            print('%-20s %s' % (name, summary(times)))
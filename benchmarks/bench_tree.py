@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+#
+# Ticks per second of the behavior tree from setup_behavior_tree2() on game states collected from real engine
+# games: Node.execute with the per-node log_execution wrapper every node used to carry (BT_TRACE=log),
+# Node.execute undecorated (tracing off, the default), and the closure chain from Node.compile(). The real
+# checks and behaviors dominate a tick, so the same tree shape is also timed with leaves that do nothing, which
+# leaves only the per-node overhead.
+#
+#   python3 benchmarks/bench_tree.py
+
+import logging, os, sys, time
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parentdir)
+
+# DEBUG logging stays off, as in a game where nobody reads bt_bot.log; log_execution still builds its strings
+# when it is switched on.
+logging.root.addHandler(logging.NullHandler())
+
+from planet_wars import PlanetWars, Planet, Fleet
+from engine import Game, load_bot, collect_orders
+from behavior_tree_bot import bt_bot
+from behavior_tree_bot.bt_nodes import set_trace_mode
+from behavior_tree_bot.bt_spec import FUNCTIONS, tree_to_dict, tree_from_dict
+
+
+def collect_snapshots(map_nums, opponent='opponent_bots/spread_bot.py', turns=200):
+    """ (planets, fleets) field tuples for player 1 on every turn of bt_bot vs opponent on each map. """
+    bot, opponent_bot = bt_bot.do_turn, load_bot(os.path.join(parentdir, opponent))
+    snapshots = []
+    for map_num in map_nums:
+        with open(os.path.join(parentdir, 'maps', 'map%d.txt' % map_num)) as f:
+            game = Game(f.read(), turns)
+        while game.winner() is None:
+            state = game.view(1)
+            snapshots.append(([(p.ID, p.x, p.y, p.owner, p.num_ships, p.growth_rate) for p in state.planets],
+                              [(f.owner, f.num_ships, f.source_planet, f.destination_planet, f.total_trip_length,
+                                f.turns_remaining) for f in state.fleets]))
+            for player_id, do_turn in ((1, bot), (2, opponent_bot)):
+                for order in collect_orders(do_turn, game.view(player_id)):
+                    game.issue_order(player_id, *order)
+            game.step()
+    return snapshots
+
+
+def make_states(snapshots):
+    return [PlanetWars.from_records([Planet(*p) for p in planets], [Fleet(*f) for f in fleets])
+            for planets, fleets in snapshots]
+
+
+def ticks_per_second(tick, snapshots, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        states = make_states(snapshots)
+        start = time.perf_counter()
+        for state in states:
+            tick(state)
+        best = min(best, time.perf_counter() - start)
+    return len(snapshots) / best
+
+
+if __name__ == '__main__':
+    snapshots = collect_snapshots(range(1, 101, 10))
+    tree = bt_bot.setup_behavior_tree2()
+    compiled = tree.compile()
+
+    # Both forms must issue exactly the same orders.
+    interpreted_states, compiled_states = make_states(snapshots), make_states(snapshots)
+    for a, b in zip(interpreted_states, compiled_states):
+        assert tree.execute(a) == compiled(b) and a.orders == b.orders
+
+    # Same shape, every leaf failing at once: a tick visits the same nodes but does no game work.
+    stubs = {name: lambda state: False for name in FUNCTIONS}
+    empty_tree = tree_from_dict(tree_to_dict(tree), stubs)
+
+    print('%d states' % len(snapshots))
+    for name, root in (('setup_behavior_tree2()', tree), ('same shape, no-op leaves', empty_tree)):
+        set_trace_mode('log')
+        logged = ticks_per_second(root.execute, snapshots)
+        set_trace_mode('off')
+        plain = ticks_per_second(root.execute, snapshots)
+        after = ticks_per_second(root.compile(), snapshots)
+        print(name)
+        print('  Node.execute, BT_TRACE=log  %10.0f ticks/s' % logged)
+        print('  Node.execute, tracing off   %10.0f ticks/s  (%.1fx)' % (plain, plain / logged))
+        print('  Node.compile()              %10.0f ticks/s  (%.1fx)' % (after, after / logged))
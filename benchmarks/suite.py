@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+#
+# Benchmark suite: ms per turn for the parser, the PlanetWars owner queries, every behavior and check, full
+# setup_behavior_tree2() ticks and every opponent bot's do_turn, on all maps with mid- and late-game fleet
+# loads. Results are written as JSON and compared with a saved baseline, so a slowdown shows up before a
+# tournament does.
+#
+#   python3 benchmarks/suite.py                   run, write benchmarks/results.json, compare with the baseline
+#   python3 benchmarks/suite.py --save-baseline   run and store the results as benchmarks/baseline.json
+
+import glob, json, os, platform, sys, time
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parentdir)
+
+from bench_parse import synthesize_turn
+from bench_tree import make_states    # also silences the bots' logging before bt_bot is imported
+
+from planet_wars import PlanetWars
+from engine import load_bot
+from behavior_tree_bot import behaviors, checks, bt_bot
+from behavior_tree_bot.bt_spec import functions
+
+RESULTS = os.path.join(parentdir, 'benchmarks', 'results.json')
+BASELINE = os.path.join(parentdir, 'benchmarks', 'baseline.json')
+
+# Fleets in flight for each load. Every case is timed once per round, ROUNDS rounds in turn, so a burst of
+# machine noise hits one pass of many cases rather than all passes of one; a case reports its fastest pass
+# and its spread, (median - fastest) / fastest.
+LOADS = {'mid': 50, 'late': 1000}
+ROUNDS = 9
+
+# A case regresses when it is slower than its baseline by more than TOLERANCE, or three times the larger of
+# the two runs' spreads if that is more, and by more than NOISE_MS absolutely. On a shared single-CPU machine
+# back-to-back runs of unchanged code still differ by up to ~30% on some cases, so TOLERANCE sits above that,
+# and the cases that are noisier still say so through their spread.
+TOLERANCE = 0.35
+NOISE_MS = 0.002
+
+
+def map_paths():
+    return sorted(glob.glob(os.path.join(parentdir, 'maps', 'map*.txt')),
+                  key=lambda path: int(os.path.basename(path)[3:-4]))
+
+
+def snapshot(state):
+    return ([(p.ID, p.x, p.y, p.owner, p.num_ships, p.growth_rate) for p in state.planets],
+            [(f.owner, f.num_ships, f.source_planet, f.destination_planet, f.total_trip_length, f.turns_remaining)
+             for f in state.fleets])
+
+
+def ms_per_turn(fn, snapshots):
+    """ Mean ms of fn(state) over one pass, each call on a fresh state built outside the timed loop. """
+    states = make_states(snapshots)
+    start = time.perf_counter()
+    for state in states:
+        fn(state)
+    return (time.perf_counter() - start) / len(snapshots) * 1000
+
+
+def parse_ms(texts):
+    start = time.perf_counter()
+    for text in texts:
+        PlanetWars(text)
+    return (time.perf_counter() - start) / len(texts) * 1000
+
+
+def owner_queries(state):
+    state.index_owners()
+    state.my_planets(), state.neutral_planets(), state.enemy_planets(), state.not_my_planets()
+    state.my_fleets(), state.enemy_fleets()
+
+
+def run_suite():
+    tree = bt_bot.setup_behavior_tree2()
+    opponents = {os.path.basename(path)[:-3]: load_bot(path)
+                 for path in sorted(glob.glob(os.path.join(parentdir, 'opponent_bots', '*.py')))}
+    cases = [('queries', owner_queries)]
+    cases += [('behaviors.' + name, fn) for name, fn in sorted(functions(behaviors).items())]
+    cases += [('checks.' + name, fn) for name, fn in sorted(functions(checks).items())]
+    cases += [('tree.setup_behavior_tree2', tree.execute)]
+    cases += [('opponent.' + name, do_turn) for name, do_turn in opponents.items()]
+
+    timers = {}
+    for load, num_fleets in LOADS.items():
+        texts = [synthesize_turn(path, num_fleets)[:-len('go\n')] for path in map_paths()]
+        snapshots = [snapshot(PlanetWars(text)) for text in texts]
+        timers['parse/' + load] = lambda texts=texts: parse_ms(texts)
+        for name, fn in cases:
+            timers[name + '/' + load] = lambda fn=fn, snapshots=snapshots: ms_per_turn(fn, snapshots)
+
+    passes = {name: [] for name in timers}
+    for _ in range(ROUNDS):
+        for name, timer in timers.items():
+            passes[name].append(timer())
+
+    results = {}
+    for name, times in passes.items():
+        times.sort()
+        fastest, median = times[0], times[len(times) // 2]
+        results[name] = {'ms': fastest, 'spread': (median - fastest) / fastest if fastest else 0.0}
+    return results
+
+
+def compare(results, baseline):
+    """ Lines for every benchmark that got slower than its baseline beyond the noise allowance. """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or not base['ms']:
+            continue
+        allowed = max(TOLERANCE, 3 * max(base['spread'], result['spread']))
+        if result['ms'] > base['ms'] * (1 + allowed) and result['ms'] - base['ms'] > NOISE_MS:
+            regressions.append('%-50s %9.4f ms -> %9.4f ms  (+%.0f%%, allowed +%.0f%%)' % (
+                name, base['ms'], result['ms'], (result['ms'] / base['ms'] - 1) * 100, allowed * 100))
+    return regressions
+
+
+if __name__ == '__main__':
+    save_baseline = sys.argv[1:] == ['--save-baseline']
+    if sys.argv[1:] and not save_baseline:
+        print('Usage: python3 benchmarks/suite.py [--save-baseline]')
+        sys.exit(1)
+
+    results = run_suite()
+    for name, result in results.items():
+        print('%-50s %9.4f ms/turn  (spread %3.0f%%)' % (name, result['ms'], result['spread'] * 100))
+
+    report = {'python': platform.python_version(), 'machine': platform.machine(), 'results': results}
+    with open(BASELINE if save_baseline else RESULTS, 'w') as f:
+        json.dump(report, f, indent=1)
+
+    if not save_baseline and os.path.exists(BASELINE):
+        with open(BASELINE) as f:
+            regressions = compare(results, json.load(f)['results'])
+        print('\n%d regression(s) against %s' % (len(regressions), BASELINE))
+        print('\n'.join(regressions))
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+#
+# In-process Planet Wars engine. Plays the same game as tools/PlayGame.jar, but calls the bots'
+# do_turn(state) functions directly instead of talking to two python3 processes over pipes.
+
+import importlib.util
+import logging
+import os
+import sys
+import time
+from collections import namedtuple
+
+from planet_wars import PlanetWars, Planet, Fleet, fight_battle
+
+# Player 2 sees the game with the owners swapped, exactly like PlayGame.jar does.
+SWAP_OWNER = (0, 2, 1)
+
+MatchResult = namedtuple('MatchResult', ['winner', 'turns', 'reason'])
+
+_loaded_bots = {}
+
+
+def load_bot(path):
+    """ Imports a bot file such as 'opponent_bots/easy_bot.py' and returns its do_turn function. """
+    path = os.path.abspath(path)
+    if path in _loaded_bots:
+        return _loaded_bots[path]
+
+    # The bots call logging.basicConfig(level=DEBUG) on import. Give the root logger a handler first so
+    # that those calls are no-ops and an in-process game does not write every debug line to disk.
+    if not logging.root.handlers:
+        logging.root.addHandler(logging.NullHandler())
+
+    parentdir = os.path.dirname(os.path.abspath(__file__))
+    if parentdir not in sys.path:
+        sys.path.append(parentdir)
+
+    name = 'bot_' + os.path.splitext(os.path.relpath(path, parentdir))[0].replace(os.sep, '_')
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    _loaded_bots[path] = module.do_turn
+    return module.do_turn
+
+
+class Game:
+    def __init__(self, map_text, max_turns=1000):
+        state = PlanetWars(map_text)
+        self.planets = state.planets
+        self.fleets = state.fleets
+        # The engine shares the per-map distance table with the bots' views.
+        self.distance = state.distance
+        self.max_turns = max_turns
+        self.turn = 0
+
+    def view(self, player_id):
+        """ The PlanetWars state as player_id would receive it from PlayGame.jar, in records of its own. """
+        swap = SWAP_OWNER if player_id == 2 else (0, 1, 2)
+        planets = [Planet(p.ID, p.x, p.y, swap[p.owner], p.num_ships, p.growth_rate) for p in self.planets]
+        fleets = [Fleet(swap[f.owner], f.num_ships, f.source_planet, f.destination_planet,
+                        f.total_trip_length, f.turns_remaining) for f in self.fleets]
+        return PlanetWars.from_records(planets, fleets)
+
+    def issue_order(self, player_id, source_planet_ID, destination_planet_ID, num_ships):
+        """ Applies one departure. Returns False for an illegal order, which PlayGame.jar punishes as a crash. """
+        if not 0 <= source_planet_ID < len(self.planets) or not 0 <= destination_planet_ID < len(self.planets):
+            return False
+        source = self.planets[source_planet_ID]
+        if source.owner != player_id or num_ships < 0 or num_ships > source.num_ships:
+            return False
+
+        source.num_ships -= num_ships
+        distance = self.distance(source_planet_ID, destination_planet_ID)
+        self.fleets.append(Fleet(player_id, num_ships, source_planet_ID, destination_planet_ID, distance, distance))
+        return True
+
+    def step(self):
+        """ Advances the game by one turn: growth, fleet movement and battles on arrival. """
+        planets = self.planets
+        for p in planets:
+            if p.owner:
+                p.num_ships += p.growth_rate
+
+        arrivals = {}
+        in_flight = []
+        for f in self.fleets:
+            if f.turns_remaining <= 1:
+                forces = arrivals.setdefault(f.destination_planet, {})
+                forces[f.owner] = forces.get(f.owner, 0) + f.num_ships
+            else:
+                f.turns_remaining -= 1
+                in_flight.append(f)
+        self.fleets = in_flight
+
+        for planet_ID, forces in arrivals.items():
+            p = planets[planet_ID]
+            p.owner, p.num_ships = fight_battle(p.owner, p.num_ships, forces)
+
+        self.turn += 1
+
+    def ships(self, player_id):
+        return sum(p.num_ships for p in self.planets if p.owner == player_id) + \
+               sum(f.num_ships for f in self.fleets if f.owner == player_id)
+
+    def winner(self):
+        """ 1 or 2 once the game is decided, 0 for a draw and None while it is still going. """
+        alive = {p.owner for p in self.planets if p.owner} | {f.owner for f in self.fleets}
+        if self.turn >= self.max_turns:
+            ships1, ships2 = self.ships(1), self.ships(2)
+            return 1 if ships1 > ships2 else 2 if ships2 > ships1 else 0
+        if len(alive) == 2:
+            return None
+        return alive.pop() if alive else 0
+
+
+def collect_orders(do_turn, state):
+    """ Runs do_turn and returns the orders it queued through planet_wars.issue_order. """
+    do_turn(state)
+    return state.orders
+
+
+def play_game(bot, opponent_bot, map_path, max_turns=1000, turn_time=1.0, record=None):
+    """
+        Plays one game and returns a MatchResult. Bots may be paths to bot files or do_turn functions.
+        reason is 'win', 'draw', 'timeout' or 'crash'; for the last two, winner is the player that did not fail.
+        With record set to a directory, each player's turns are saved there as a recorder.py recording.
+    """
+    players = {1: load_bot(bot) if isinstance(bot, str) else bot,
+               2: load_bot(opponent_bot) if isinstance(opponent_bot, str) else opponent_bot}
+    with open(map_path) as f:
+        game = Game(f.read(), max_turns)
+
+    recorders = {}
+    if record:
+        from recorder import Recorder
+        map_name = os.path.splitext(os.path.basename(map_path))[0]
+        for player_id, player in ((1, bot), (2, opponent_bot)):
+            name = os.path.splitext(os.path.basename(player))[0] if isinstance(player, str) else player.__module__
+            recorders[player_id] = Recorder(os.path.join(record, '%s-%s-p%d.pwr' % (name, map_name, player_id)))
+
+    previous_level = logging.root.manager.disable
+    logging.disable(logging.INFO)
+    try:
+        while True:
+            winner = game.winner()
+            if winner is not None:
+                return MatchResult(winner, game.turn, 'win' if winner else 'draw')
+
+            orders = {}
+            for player_id, do_turn in players.items():
+                state = game.view(player_id)
+                if recorders:
+                    recorders[player_id].start_turn(state)
+                start = time.perf_counter()
+                try:
+                    orders[player_id] = collect_orders(do_turn, state)
+                except Exception:
+                    logging.exception('Player %d crashed.', player_id)
+                    return MatchResult(3 - player_id, game.turn, 'crash')
+                if time.perf_counter() - start > turn_time:
+                    return MatchResult(3 - player_id, game.turn, 'timeout')
+                if recorders:
+                    recorders[player_id].end_turn(state)
+
+            for player_id, player_orders in orders.items():
+                for order in player_orders:
+                    if not game.issue_order(player_id, *order):
+                        return MatchResult(3 - player_id, game.turn, 'crash')
+            game.step()
+    finally:
+        logging.disable(previous_level)
+        for recorder in recorders.values():
+            recorder.close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4:
+        print('Usage: python3 engine.py <bot.py> <opponent_bot.py> <map.txt>')
+        sys.exit(1)
+
+    start = time.perf_counter()
+    result = play_game(sys.argv[1], sys.argv[2], sys.argv[3], record=os.environ.get('PLANET_WARS_RECORD'))
+    elapsed = time.perf_counter() - start
+    if result.reason == 'draw':
+        print('Draw after', result.turns, 'turns.')
+    else:
+        print('Player', result.winner, 'Wins!', '(' + result.reason + ' after', result.turns, 'turns,',
+              '%.2fs)' % elapsed)
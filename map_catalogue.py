@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+#
+# Catalogue of the maps in maps/: parsed planets, the distance matrix and a few features per map, cached in
+# map_catalogue.pickle and keyed by the sha1 of each map file, so only new or edited maps are ever parsed
+# again. Tournaments use it to pick map subsets that cover the range of a feature.
+#
+#   python3 map_catalogue.py            feature table for every map
+#   python3 map_catalogue.py --rebuild  the same, after rebuilding the cache from scratch
+
+import glob
+import hashlib
+import os
+import pickle
+import random
+import sys
+import time
+from collections import namedtuple
+
+from planet_wars import PlanetWars, Planet
+
+parentdir = os.path.dirname(os.path.abspath(__file__))
+CACHE = os.path.join(parentdir, 'map_catalogue.pickle')
+CACHE_VERSION = 1
+
+# planets holds (ID, x, y, owner, num_ships, growth_rate) tuples; distances[source][destination] in turns.
+MapInfo = namedtuple('MapInfo', ['number', 'path', 'sha1', 'planets', 'distances', 'num_planets', 'total_growth',
+                                 'start_distance', 'neutral_cost_per_growth'])
+
+FEATURES = ('num_planets', 'total_growth', 'start_distance', 'neutral_cost_per_growth')
+
+
+def map_number(path):
+    return int(os.path.basename(path)[3:-4])
+
+
+def describe(path, text, sha1):
+    state = PlanetWars(text)
+    planets = tuple((p.ID, p.x, p.y, p.owner, p.num_ships, p.growth_rate) for p in state.planets)
+    neutrals = [p for p in state.neutral_planets() if p.growth_rate > 0]
+    # Turns between the two home planets, and how many ships the neutrals cost per unit of growth they give.
+    start_distance = min((state.distance(mine.ID, theirs.ID) for mine in state.my_planets()
+                          for theirs in state.enemy_planets()), default=0)
+    growth = sum(p.growth_rate for p in neutrals)
+    return MapInfo(map_number(path), os.path.relpath(path, parentdir), sha1, planets, state.distances,
+                   len(planets), sum(p.growth_rate for p in state.planets), start_distance,
+                   sum(p.num_ships for p in neutrals) / growth if growth else 0.0)
+
+
+def load_catalogue(map_dir=os.path.join(parentdir, 'maps'), rebuild=False):
+    """ {map number: MapInfo} for every mapN.txt in map_dir, from the cache where the file is unchanged. """
+    cached = {}
+    if not rebuild and os.path.exists(CACHE):
+        with open(CACHE, 'rb') as f:
+            version, entries = pickle.load(f)
+        if version == CACHE_VERSION:
+            cached = {sha1: MapInfo(*fields) for sha1, fields in entries.items()}
+
+    catalogue, changed = {}, False
+    for path in glob.glob(os.path.join(map_dir, 'map*.txt')):
+        with open(path, 'rb') as f:
+            data = f.read()
+        sha1 = hashlib.sha1(data).hexdigest()
+        info = cached.get(sha1)
+        if info is None:
+            info = describe(path, data, sha1)
+            changed = True
+        elif info.number != map_number(path):
+            info = info._replace(number=map_number(path), path=os.path.relpath(path, parentdir))
+        catalogue[info.number] = info
+
+    if changed or len(cached) != len(catalogue):
+        with open(CACHE, 'wb') as f:
+            # Plain tuples, so the cache does not depend on the module MapInfo was defined in (__main__ or not).
+            pickle.dump((CACHE_VERSION, {info.sha1: tuple(info) for info in catalogue.values()}), f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+    return dict(sorted(catalogue.items()))
+
+
+def map_state(info):
+    """ A fresh PlanetWars for the map's starting position. """
+    return PlanetWars.from_records([Planet(*planet) for planet in info.planets], [])
+
+
+def stratified(catalogue, count, feature='start_distance', strata=None, seed=0):
+    """
+        count map numbers spread over the range of feature: the maps are sorted by it, cut into strata groups of
+        (nearly) equal size, and the same number of maps is drawn at random from each group. When count does not
+        divide evenly, the maps left over are drawn one each from the largest groups.
+    """
+    if feature not in FEATURES:
+        raise ValueError('Unknown map feature: %r' % feature)
+    if count < 1:
+        raise ValueError('Map count must be at least 1, not %d' % count)
+    ordered = sorted(catalogue.values(), key=lambda info: (getattr(info, feature), info.number))
+    count = min(count, len(ordered))
+    strata = min(strata or count, count)
+    rng = random.Random(seed)
+    groups = [ordered[s * len(ordered) // strata:(s + 1) * len(ordered) // strata] for s in range(strata)]
+    takes = [count // strata] * strata
+    # Groups differ in size by at most one and count <= len(ordered), so the largest groups always have room.
+    for s in sorted(range(strata), key=lambda s: -len(groups[s]))[:count % strata]:
+        takes[s] += 1
+    chosen = []
+    for group, take in zip(groups, takes):
+        chosen += rng.sample(group, take)
+    return sorted(info.number for info in chosen)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] not in ([], ['--rebuild']):
+        print('Usage: python3 map_catalogue.py [--rebuild]')
+        sys.exit(1)
+
+    start = time.perf_counter()
+    catalogue = load_catalogue(rebuild=sys.argv[1:] == ['--rebuild'])
+    elapsed = time.perf_counter() - start
+
+    print('%6s' % 'map' + ''.join('%26s' % feature for feature in FEATURES))
+    for number, info in catalogue.items():
+        print('%6d' % number + ''.join('%26.6g' % getattr(info, feature) for feature in FEATURES))
+    print('%d maps loaded in %.1f ms' % (len(catalogue), elapsed * 1000))
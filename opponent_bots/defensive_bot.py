@@ -7,7 +7,7 @@ parentdir = os.path.dirname(currentdir)
 sys.path.append(parentdir)
 
 
-from planet_wars import PlanetWars, issue_order, finish_turn
+from planet_wars import PlanetWars, read_turns, issue_order, finish_turn
 
 
 def spread(state):
@@ -41,10 +41,14 @@ def defend(state):
     if not my_planets:
         return
 
+    incoming = state.blackboard.incoming
+    # Ship counts as they were before this function issued any orders. The planet records change in place as
+    # orders go out, but this bot has always weighed its planets by their starting garrison (plus the fleets
+    # in flight, which do include the ones it just sent).
+    ships = {planet.ID: planet.num_ships for planet in my_planets}
+
     def strength(p):
-        return p.num_ships \
-               + sum(fleet.num_ships for fleet in state.my_fleets() if fleet.destination_planet == p.ID) \
-               - sum(fleet.num_ships for fleet in state.enemy_fleets() if fleet.destination_planet == p.ID)
+        return ships[p.ID] + incoming[p.ID][1] - incoming[p.ID][2]
 
     avg = sum(strength(planet) for planet in my_planets) / len(my_planets)
 
@@ -86,16 +90,11 @@ if __name__ == '__main__':
     logging.basicConfig(filename=__file__[:-3] + '.log', filemode='w', level=logging.DEBUG)
 
     try:
-        map_data = ''
-        while True:
-            current_line = input()
-            if len(current_line) >= 2 and current_line.startswith("go"):
-                planet_wars = PlanetWars(map_data)
-                do_turn(planet_wars)
-                finish_turn()
-                map_data = ''
-            else:
-                map_data += current_line + '\n'
+        planet_wars = PlanetWars()
+        for turn in read_turns():
+            planet_wars.update(turn)
+            do_turn(planet_wars)
+            finish_turn(planet_wars)
 
     except KeyboardInterrupt:
         print('ctrl-c, leaving ...')
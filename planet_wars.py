@@ -1,11 +1,14 @@
 #!/usr/bin/env python
 #
 
+from bisect import bisect_right
 from math import ceil, sqrt
-from collections import namedtuple
-from sys import stdout
+from os import environ
+from sys import stdin, stdout
 import logging
 
+from spatial import SpatialIndex
+
 
 def issue_order(state, source_planet_ID, destination_planet_ID, fleet_num_ships):
     # Check for legal order
@@ -16,52 +19,294 @@ def issue_order(state, source_planet_ID, destination_planet_ID, fleet_num_ships)
 
     # Update state
     distance = state.distance(source_planet_ID, destination_planet_ID)
-    state.fleets.append(Fleet(1, fleet_num_ships, source_planet_ID, destination_planet_ID, distance, distance))
-    state.planets[source_planet_ID] = planet._replace(num_ships =planet.num_ships - fleet_num_ships)
+    state.launch_fleet(Fleet(1, fleet_num_ships, source_planet_ID, destination_planet_ID, distance, distance))
 
-    # Send order
+    # Queue order; finish_turn sends the whole outbox at once
     logging.debug("Order:" + ' '.join([str(source_planet_ID), str(destination_planet_ID), str(fleet_num_ships)]))
-    stdout.write("%d %d %d\n" % (source_planet_ID, destination_planet_ID, fleet_num_ships))
-    stdout.flush()
+    state.orders.append((source_planet_ID, destination_planet_ID, int(fleet_num_ships)))
     return True
 
 
-def finish_turn():
-    # Must pass "go" to game.
+def finish_turn(state):
+    # Sends the turn's orders followed by "go", which the game requires, in one write and one flush.
     logging.debug('Finish turn\n')
-    stdout.write("go\n")
+    if recorder is not None:
+        recorder.end_turn(state)
+    stdout.write(''.join(["%d %d %d\n" % order for order in state.orders]) + "go\n")
     stdout.flush()
 
 
-Fleet = namedtuple('Fleet', ['owner', 'num_ships', 'source_planet', 'destination_planet', 'total_trip_length',
-                             'turns_remaining'])
+# Planets and fleets are small mutable records: the same attributes the namedtuples had, integer owners and
+# ship counts, and changes made in place instead of allocating a replacement for every order.
+class Fleet:
+    __slots__ = ('owner', 'num_ships', 'source_planet', 'destination_planet', 'total_trip_length',
+                 'turns_remaining')
+
+    def __init__(self, owner, num_ships, source_planet, destination_planet, total_trip_length, turns_remaining):
+        self.owner = owner
+        self.num_ships = num_ships
+        self.source_planet = source_planet
+        self.destination_planet = destination_planet
+        self.total_trip_length = total_trip_length
+        self.turns_remaining = turns_remaining
+
+    def __repr__(self):
+        return 'Fleet(owner=%d, num_ships=%d, source_planet=%d, destination_planet=%d, total_trip_length=%d, ' \
+               'turns_remaining=%d)' % (self.owner, self.num_ships, self.source_planet, self.destination_planet,
+                                        self.total_trip_length, self.turns_remaining)
+
+
+class Planet:
+    __slots__ = ('ID', 'x', 'y', 'owner', 'num_ships', 'growth_rate')
+
+    def __init__(self, ID, x, y, owner, num_ships, growth_rate):
+        self.ID = ID
+        self.x = x
+        self.y = y
+        self.owner = owner
+        self.num_ships = num_ships
+        self.growth_rate = growth_rate
+
+    def __repr__(self):
+        return 'Planet(ID=%d, x=%r, y=%r, owner=%d, num_ships=%d, growth_rate=%d)' % \
+               (self.ID, self.x, self.y, self.owner, self.num_ships, self.growth_rate)
+
+
+class Blackboard:
+    # Per-turn totals, indexed by owner (0 neutral, 1 me, 2 enemy), worked out in one pass over the state.
+    # incoming[planet ID][owner] is the number of ships that owner has in flight towards that planet.
+    __slots__ = ('planet_ships', 'fleet_ships', 'growth', 'incoming')
+
+    def __init__(self, state):
+        planet_ships = [0, 0, 0]
+        fleet_ships = [0, 0, 0]
+        growth = [0, 0, 0]
+        incoming = [[0, 0, 0] for _ in state.planets]
+        for planet in state.planets:
+            planet_ships[planet.owner] += planet.num_ships
+            growth[planet.owner] += planet.growth_rate
+        for fleet in state.fleets:
+            fleet_ships[fleet.owner] += fleet.num_ships
+            incoming[fleet.destination_planet][fleet.owner] += fleet.num_ships
+
+        self.planet_ships = planet_ships
+        self.fleet_ships = fleet_ships
+        self.growth = growth
+        self.incoming = incoming
+
+    def total_ships(self, owner):
+        return self.planet_ships[owner] + self.fleet_ships[owner]
+
+    def launched(self, fleet):
+        # Ships moved from a planet into a new fleet; totals per owner are unchanged.
+        self.planet_ships[fleet.owner] -= fleet.num_ships
+        self.fleet_ships[fleet.owner] += fleet.num_ships
+        self.incoming[fleet.destination_planet][fleet.owner] += fleet.num_ships
+
+
+def fight_battle(owner, num_ships, forces):
+    # Resolves the fight at one planet, with the engine's rules. forces maps owner -> ships arriving this turn.
+    # The planet's own garrison joins its owner's side; the largest force wins with the difference to the
+    # second largest. On a tie for first place the planet keeps its owner with zero ships. The caller's forces
+    # are left as they were.
+    forces = dict(forces)
+    forces[owner] = forces.get(owner, 0) + num_ships
+    winner, first, second = owner, 0, 0
+    for player, ships in forces.items():
+        if ships > second:
+            if ships > first:
+                winner, first, second = player, ships, first
+            else:
+                second = ships
+    if first > second:
+        return winner, first - second
+    return owner, 0
+
+
+class Forecast:
+    # Each planet's owner and ship count for the next `horizon` turns if no new fleets are sent, built from
+    # the fleets already in flight. owner[p][t] and ships[p][t] are after turn t's battle (t = 0 is now).
+    # needed[p][t] is how many of my ships must land on planet p at turn t for me to own it afterwards.
+    __slots__ = ('horizon', 'owner', 'ships', 'needed')
+
+    def __init__(self, state, horizon):
+        # One pass over the fleets buckets them by destination and arrival turn ...
+        arrivals = [{} for _ in state.planets]
+        for fleet in state.fleets:
+            if fleet.turns_remaining <= horizon:
+                forces = arrivals[fleet.destination_planet].setdefault(fleet.turns_remaining, {})
+                forces[fleet.owner] = forces.get(fleet.owner, 0) + fleet.num_ships
+
+        # ... then each planet steps through growth and battles turn by turn: O(P*H + F).
+        self.horizon = horizon
+        self.owner, self.ships, self.needed = [], [], []
+        for planet in state.planets:
+            owner, ships = planet.owner, planet.num_ships
+            owners, ships_timeline = [owner], [ships]
+            needed = [0 if owner == 1 else ships + 1]
+            planet_arrivals = arrivals[planet.ID]
+            for turn in range(1, horizon + 1):
+                if owner:
+                    ships += planet.growth_rate
+                forces = planet_arrivals.get(turn)
+                if forces is None:
+                    needed.append(0 if owner == 1 else ships + 1)
+                else:
+                    mine = forces.get(1, 0) + (ships if owner == 1 else 0)
+                    others = max([forces.get(player, 0) + (ships if owner == player else 0) for player in (0, 2)])
+                    # A tie for first place leaves the planet with its current owner.
+                    needed.append(max(0, others - mine + (0 if owner == 1 else 1)))
+                    owner, ships = fight_battle(owner, ships, forces)
+                owners.append(owner)
+                ships_timeline.append(ships)
+            self.owner.append(owners)
+            self.ships.append(ships_timeline)
+            self.needed.append(needed)
+
+    def owner_at(self, planet_ID, turn):
+        return self.owner[planet_ID][turn]
 
-Planet = namedtuple('Planet', ['ID', 'x', 'y', 'owner', 'num_ships', 'growth_rate'])
+    def ships_at(self, planet_ID, turn):
+        return self.ships[planet_ID][turn]
+
+    def ships_needed(self, planet_ID, turn):
+        # Ships I must land at that turn to take the planet, or to keep it if it is already mine.
+        return self.needed[planet_ID][turn]
+
+
+# Planet positions never change during a game, so the travel distances are worked out once per map and
+# every later PlanetWars instance on the same map shares the tables: distances[source][destination], and for
+# each planet its neighbors as (IDs, distances), every other planet ordered by distance then ID, the
+# longest trip on the map, and the grid over the planet positions for nearest-planet queries (see spatial.py).
+_map_tables = {}
+
+
+def map_tables(planets):
+    key = tuple((p.x, p.y) for p in planets)
+    tables = _map_tables.get(key)
+    if tables is None:
+        distances = [[int(ceil(sqrt((s.x - d.x) ** 2 + (s.y - d.y) ** 2))) for d in planets] for s in planets]
+        neighbors = []
+        for source, row in enumerate(distances):
+            ordered = sorted((distance, ID) for ID, distance in enumerate(row) if ID != source)
+            neighbors.append(([ID for _, ID in ordered], [distance for distance, _ in ordered]))
+        max_distance = max((row[-1] for _, row in neighbors if row), default=0)
+        tables = _map_tables[key] = (distances, neighbors, max_distance, SpatialIndex(planets))
+    return tables
 
 
 class PlanetWars:
-    def __init__(self, game_state):
+    def __init__(self, game_state=''):
         self.planets = []
         self.fleets = []
+        self.orders = []    # (source, destination, ships) issued this turn, sent by finish_turn
         parse_game_state(self, game_state)
+        self.distances, self.neighbor_table, self.max_distance, self.spatial = map_tables(self.planets)
+        self.index_owners()
+
+    def update(self, game_state):
+        # Applies the next turn's engine text to a long-lived state. Positions and growth rates never change,
+        # so the planet records are kept and their owner and ship count updated in place; the fleet list is
+        # rebuilt.
+        self.orders = []
+        if not self.planets:
+            parse_game_state(self, game_state)
+            self.distances, self.neighbor_table, self.max_distance, self.spatial = map_tables(self.planets)
+            self.index_owners()
+            if recorder is not None:
+                recorder.start_turn(self)
+            return
+
+        planets = self.planets
+        tokens = tokenize_game_state(game_state)
+        i, n = 0, len(tokens)
+        for planet in planets:
+            assert i < n and tokens[i] == b'P', 'Wrong planet specification'
+            planet.owner = int(tokens[i + 3])
+            planet.num_ships = int(tokens[i + 4])
+            i += 6
+        self.fleets = parse_fleets(tokens, i)
+        self.index_owners()
+        if recorder is not None:
+            recorder.start_turn(self)
+
+    @classmethod
+    def from_records(cls, planets, fleets):
+        # Builds a state from existing Planet and Fleet records instead of engine text.
+        pw = cls('')
+        pw.planets = list(planets)
+        pw.fleets = list(fleets)
+        pw.distances, pw.neighbor_table, pw.max_distance, pw.spatial = map_tables(pw.planets)
+        pw.index_owners()
+        return pw
+
+    def index_owners(self):
+        # Splits planets and fleets by owner once per turn, keeping ID / arrival order within each part.
+        # launch_fleet keeps the fleet parts current as orders are issued; planets change in place.
+        planets_by_owner = {0: [], 1: [], 2: []}
+        not_my_planets = []
+        for planet in self.planets:
+            planets_by_owner[planet.owner].append(planet)
+            if planet.owner != 1:
+                not_my_planets.append(planet)
+        fleets_by_owner = {1: [], 2: []}
+        for fleet in self.fleets:
+            fleets_by_owner[fleet.owner].append(fleet)
+
+        self._planets_by_owner = planets_by_owner
+        self._not_my_planets = not_my_planets
+        self._fleets_by_owner = fleets_by_owner
+        self._blackboard = None
+        self._forecast = None
+        # Memoized check results for this turn and the counters that invalidate them (see bt_nodes.reads).
+        self.check_cache = {}
+        self.version = {'owners': 0, 'ships': 0, 'fleets': 0}
 
+    @property
+    def blackboard(self):
+        # Built on first use each turn, then kept current by launch_fleet.
+        if self._blackboard is None:
+            self._blackboard = Blackboard(self)
+        return self._blackboard
+
+    def launch_fleet(self, fleet):
+        # Takes the fleet's ships off its source planet and puts the fleet in flight.
+        self.planets[fleet.source_planet].num_ships -= fleet.num_ships
+        self.fleets.append(fleet)
+        self._fleets_by_owner[fleet.owner].append(fleet)
+        if self._blackboard is not None:
+            self._blackboard.launched(fleet)
+        self._forecast = None
+        self.version['ships'] += 1
+        self.version['fleets'] += 1
+
+    def forecast(self, horizon=None):
+        # Future of every planet given the fleets in flight. By default it looks as far ahead as the longest
+        # trip on the map, which covers every fleet. Cached until the next order or turn.
+        if horizon is None:
+            horizon = self.max_distance
+        if self._forecast is None or self._forecast.horizon != horizon:
+            self._forecast = Forecast(self, horizon)
+        return self._forecast
+
+    # The lists below are shared per-turn indexes: read them, but copy before sorting or changing them.
     def my_planets(self):
-        return [planet for planet in self.planets if planet.owner == 1]
+        return self._planets_by_owner[1]
 
     def neutral_planets(self):
-        return [planet for planet in self.planets if planet.owner == 0]
+        return self._planets_by_owner[0]
 
     def enemy_planets(self):
-        return [planet for planet in self.planets if planet.owner == 2]
+        return self._planets_by_owner[2]
 
     def not_my_planets(self):
-        return [planet for planet in self.planets if planet.owner != 1]
+        return self._not_my_planets
 
     def my_fleets(self):
-        return [fleet for fleet in self.fleets if fleet.owner == 1]
+        return self._fleets_by_owner[1]
 
     def enemy_fleets(self):
-        return [fleet for fleet in self.fleets if fleet.owner == 2]
+        return self._fleets_by_owner[2]
 
     def __str__(self):
         s = ''
@@ -75,35 +320,74 @@ class PlanetWars:
         return s
 
     def distance(self, source_planet, destination_planet):
-        source = self.planets[source_planet]
-        destination = self.planets[destination_planet]
-        dx = source.x - destination.x
-        dy = source.y - destination.y
-        return int(ceil(sqrt(dx * dx + dy * dy)))
+        return self.distances[source_planet][destination_planet]
+
+    def nearest_planets(self, planet_ID, k=1, owner=None):
+        # The k planets closest to planet_ID, optionally only one owner's, ordered by distance then ID.
+        return self.spatial.nearest(self.planets, planet_ID, k, owner)
+
+    def planets_within(self, planet_ID, turns, owner=None):
+        # Planets at most turns away from planet_ID, optionally only one owner's, ordered by distance then ID.
+        planets = self.planets
+        IDs, distances = self.neighbor_table[planet_ID]
+        reach = bisect_right(distances, turns)
+        if owner is None:
+            return [planets[IDs[i]] for i in range(reach)]
+        return [planets[IDs[i]] for i in range(reach) if planets[IDs[i]].owner == owner]
 
     def is_alive(self, player_id):
         return any(planet.owner == player_id for planet in self.planets) or \
                 any(fleet.owner == player_id for fleet in self.fleets)
 
 
-def parse_game_state(pw_instance, state):
-    lines = state.split("\n")
+def read_turns(stream=None):
+    # Yields the raw bytes of each turn the engine sends, everything before its 'go' line, collected in one
+    # buffer straight from the binary stdin.
+    if stream is None:
+        stream = stdin.buffer
+    buffer = bytearray()
+    for line in stream:
+        if line.startswith(b'go'):
+            yield bytes(buffer)
+            buffer.clear()
+        else:
+            buffer += line
+
+
+def tokenize_game_state(state):
+    # Engine text (str or bytes) as one flat list of byte tokens with '#' comments removed.
+    if isinstance(state, str):
+        state = state.encode()
+    if b'#' in state:
+        state = b'\n'.join(line.split(b'#')[0] for line in state.split(b'\n'))
+    return state.split()
 
-    planet_lines = [line for line in lines if line.startswith('P')]
-    fleet_lines = [line for line in lines if line.startswith('F')]
 
-    for planet_id, line in enumerate(planet_lines):
-        line = line.split('#')[0]
-        params = line.split(' ')[1:]
-        assert len(params) == 5, 'Wrong planet specification: ' + line
+def parse_fleets(tokens, start):
+    # The engine sends every fleet after the planets, as 'F' and six integers each, so the whole tail is
+    # converted in bulk: drop the tags, turn the rest into ints, and zip the six columns into Fleets.
+    fields = tokens[start:]
+    assert len(fields) % 7 == 0 and fields[::7].count(b'F') == len(fields) // 7, 'Wrong fleet specification'
+    del fields[::7]
+    ints = list(map(int, fields))
+    return list(map(Fleet, ints[0::6], ints[1::6], ints[2::6], ints[3::6], ints[4::6], ints[5::6]))
 
-        p = Planet(planet_id, *map(float, params))
-        pw_instance.planets.append(p)
 
-    for line in fleet_lines:
-        line = line.split('#')[0]
-        params = line.split(' ')[1:]
-        assert len(params) == 6, 'Wrong fleet specification: ' + line
+def parse_game_state(pw_instance, state):
+    # Single pass over the tokens: 'P x y owner ships growth' entries, then the fleets.
+    planets = pw_instance.planets
+    tokens = tokenize_game_state(state)
+    i, n = 0, len(tokens)
+    while i < n and tokens[i] == b'P':
+        planets.append(Planet(len(planets), float(tokens[i + 1]), float(tokens[i + 2]), int(tokens[i + 3]),
+                              int(tokens[i + 4]), int(tokens[i + 5])))
+        i += 6
+    pw_instance.fleets.extend(parse_fleets(tokens, i))
+
 
-        f = Fleet(*map(int, params))
-        pw_instance.fleets.append(f)
+# Set PLANET_WARS_RECORD to a directory and every bot process records the turns it plays there, from update()
+# to finish_turn(); see recorder.py for the format and the reader.
+recorder = None
+if environ.get('PLANET_WARS_RECORD'):
+    from recorder import Recorder
+    recorder = Recorder.for_process(environ['PLANET_WARS_RECORD'])
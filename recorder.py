@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+#
+# Compact binary recording of the turns a bot plays: what the engine sent it and the orders it answered with.
+#
+# A recording is two append-only files. <name>.pwr starts with the static map, then holds one record per
+# turn; <name>.pwr.idx holds each record's offset as a little-endian uint64, so turn n is found in O(1) and
+# both files can be memory-mapped. A record is only indexed after it has been written in full, so a bot
+# killed mid-write leaves a readable recording.
+#
+#   header   b'PWR1', planet count P (uint32), then P x (float64), P y (float64), P growth rates (int32)
+#   record   fleet count F and order count O (uint32 each), then column by column:
+#            planet owners (P uint8), planet ships (P int32),
+#            fleet owners (F uint8), ships (F int32), sources, destinations, trip lengths, turns remaining
+#            (F uint16 each), order sources, destinations (O uint16 each) and ships (O int32)
+#
+#   python3 recorder.py <recording.pwr>           summary
+#   python3 recorder.py <recording.pwr> <turn>    that turn as engine text, followed by the recorded orders
+
+import os
+import struct
+import sys
+from mmap import mmap, ACCESS_READ
+
+MAGIC = b'PWR1'
+COUNTS = struct.Struct('<II')
+OFFSET = struct.Struct('<Q')
+
+
+def record_format(num_planets, num_fleets, num_orders):
+    P, F, O = num_planets, num_fleets, num_orders
+    return struct.Struct('<%dB%di%dB%di%dH%dH%dH%dH%dH%dH%di' % (P, P, F, F, F, F, F, F, O, O, O))
+
+
+class Recorder:
+    def __init__(self, path):
+        # Files are created on the first turn, so a process that never plays leaves nothing behind.
+        self.path = path
+        self.data = None
+        self.index = None
+        self.pending = None
+
+    @classmethod
+    def for_process(cls, directory):
+        # One recording per bot process: <directory>/<bot name>-<pid>.pwr
+        name = os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'bot'
+        return cls(os.path.join(directory, '%s-%d.pwr' % (name, os.getpid())))
+
+    def open(self, planets):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.data = open(self.path, 'wb')
+        self.index = open(self.path + '.idx', 'wb')
+        P = len(planets)
+        self.data.write(MAGIC + struct.pack('<I%dd%dd%di' % (P, P, P), P, *[p.x for p in planets],
+                                            *[p.y for p in planets], *[p.growth_rate for p in planets]))
+
+    def start_turn(self, state):
+        # Called with the state as the engine sent it, before the bot changes it by issuing orders.
+        planets, fleets = state.planets, state.fleets
+        if self.data is None:
+            self.open(planets)
+        self.pending = (
+            [p.owner for p in planets] + [p.num_ships for p in planets] +
+            [f.owner for f in fleets] + [f.num_ships for f in fleets] + [f.source_planet for f in fleets] +
+            [f.destination_planet for f in fleets] + [f.total_trip_length for f in fleets] +
+            [f.turns_remaining for f in fleets],
+            len(planets), len(fleets))
+
+    def end_turn(self, state):
+        # Called with the orders the bot is about to send; appends the whole turn and indexes it.
+        if self.pending is None:
+            return
+        values, num_planets, num_fleets = self.pending
+        orders = state.orders
+        values += [o[0] for o in orders] + [o[1] for o in orders] + [o[2] for o in orders]
+        offset = self.data.tell()
+        self.data.write(COUNTS.pack(num_fleets, len(orders)) +
+                        record_format(num_planets, num_fleets, len(orders)).pack(*values))
+        self.data.flush()
+        self.index.write(OFFSET.pack(offset))
+        self.index.flush()
+        self.pending = None
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.index.close()
+
+
+def map_file(path):
+    with open(path, 'rb') as f:
+        return mmap(f.fileno(), 0, access=ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+
+
+class Recording:
+    # Read side: recording[n] is turn n as (planets, fleets, orders), read straight from the mapped file.
+    def __init__(self, path):
+        self.data = map_file(path)
+        self.index = map_file(path + '.idx')
+        assert self.data[:4] == MAGIC, 'Not a Planet Wars recording: ' + path
+        P, = struct.unpack_from('<I', self.data, 4)
+        static = struct.unpack_from('<%dd%dd%di' % (P, P, P), self.data, 8)
+        self.num_planets = P
+        self.xs, self.ys, self.growth = static[:P], static[P:2 * P], static[2 * P:]
+
+    def __len__(self):
+        return len(self.index) // OFFSET.size
+
+    def offset(self, turn):
+        if not 0 <= turn < len(self):
+            raise IndexError('turn %d out of range' % turn)
+        return OFFSET.unpack_from(self.index, turn * OFFSET.size)[0]
+
+    def __getitem__(self, turn):
+        # Imported here: planet_wars itself imports this module when recording is switched on.
+        from planet_wars import Planet, Fleet
+        offset = self.offset(turn)
+        F, O = COUNTS.unpack_from(self.data, offset)
+        P = self.num_planets
+        values = record_format(P, F, O).unpack_from(self.data, offset + COUNTS.size)
+        planets = list(map(Planet, range(P), self.xs, self.ys, values[:P], values[P:2 * P], self.growth))
+        i = 2 * P
+        fleets = list(map(Fleet, *(values[i + k * F:i + (k + 1) * F] for k in range(6))))
+        i += 6 * F
+        orders = list(zip(values[i:i + O], values[i + O:i + 2 * O], values[i + 2 * O:i + 3 * O]))
+        return planets, fleets, orders
+
+    def __iter__(self):
+        for turn in range(len(self)):
+            yield self[turn]
+
+    def state(self, turn):
+        # Turn n as a fresh PlanetWars, exactly as the bot received it.
+        from planet_wars import PlanetWars
+        planets, fleets, _ = self[turn]
+        return PlanetWars.from_records(planets, fleets)
+
+
+def engine_text(planets, fleets):
+    return ''.join(['P %r %r %d %d %d\n' % (p.x, p.y, p.owner, p.num_ships, p.growth_rate) for p in planets] +
+                   ['F %d %d %d %d %d %d\n' % (f.owner, f.num_ships, f.source_planet, f.destination_planet,
+                                               f.total_trip_length, f.turns_remaining) for f in fleets])
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        print('Usage: python3 recorder.py <recording.pwr> [<turn>]')
+        sys.exit(1)
+
+    recording = Recording(sys.argv[1])
+    if len(sys.argv) == 3:
+        planets, fleets, orders = recording[int(sys.argv[2])]
+        sys.stdout.write(engine_text(planets, fleets) + 'go\n')
+        sys.stdout.write(''.join('%d %d %d\n' % order for order in orders) + 'go\n')
+    else:
+        size = len(recording.data) + len(recording.index)
+        print('%d planets, %d turns, %d bytes (%.0f bytes/turn)' %
+              (recording.num_planets, len(recording), size, size / max(len(recording), 1)))
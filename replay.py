@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+#
+# Offline replay: feeds recorded turns (see recorder.py) straight into a bot's do_turn, in-process and without
+# the engine or an opponent, and reports how long each turn took against PlayGame.jar's 1000 ms limit.
+#
+#   python3 replay.py <bot.py> <recording.pwr> [<recording.pwr> ...]
+#
+# Recordings come from bot processes run with PLANET_WARS_RECORD=<dir>, or from engine.py games with the same
+# variable set.
+
+import logging
+import sys
+import time
+
+from engine import load_bot, collect_orders
+from recorder import Recording
+
+TURN_LIMIT_MS = 1000.0
+
+
+def replay(do_turn, recording_paths):
+    """
+        Runs do_turn on every recorded turn and returns (path, turn, ms, orders, recorded_orders) per turn.
+        Each turn gets a fresh state, built outside the timed call.
+    """
+    turns = []
+    previous_level = logging.root.manager.disable
+    logging.disable(logging.INFO)
+    try:
+        for path in recording_paths:
+            recording = Recording(path)
+            for turn in range(len(recording)):
+                state = recording.state(turn)
+                start = time.perf_counter()
+                orders = collect_orders(do_turn, state)
+                ms = (time.perf_counter() - start) * 1000
+                turns.append((path, turn, ms, orders, recording[turn][2]))
+    finally:
+        logging.disable(previous_level)
+    return turns
+
+
+def percentile(sorted_values, q):
+    """ Nearest-rank percentile of an already sorted list. """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def latency_summary(milliseconds):
+    values = sorted(milliseconds)
+    return {'turns': len(values), 'p50': percentile(values, 50), 'p95': percentile(values, 95),
+            'p99': percentile(values, 99), 'max': values[-1] if values else 0.0}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print('Usage: python3 replay.py <bot.py> <recording.pwr> [<recording.pwr> ...]')
+        sys.exit(1)
+
+    turns = replay(load_bot(sys.argv[1]), sys.argv[2:])
+
+    print('%-40s %6s %9s %9s %9s %9s %9s' % ('recording', 'turns', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms',
+                                            'same'))
+    for path in sys.argv[2:] + ['all']:
+        rows = [t for t in turns if path in ('all', t[0])]
+        summary = latency_summary([t[2] for t in rows])
+        same = sum(orders == recorded for _, _, _, orders, recorded in rows)
+        print('%-40s %6d %9.3f %9.3f %9.3f %9.3f %8.0f%%' % (
+            path[-40:], summary['turns'], summary['p50'], summary['p95'], summary['p99'], summary['max'],
+            100.0 * same / max(len(rows), 1)))
+
+    if turns:
+        path, turn, ms, _, _ = max(turns, key=lambda t: t[2])
+        print('\nWorst turn: %s turn %d, %.3f ms (%.1f%% of the %d ms limit)' %
+              (path, turn, ms, 100 * ms / TURN_LIMIT_MS, TURN_LIMIT_MS))
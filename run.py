@@ -1,5 +1,10 @@
 import subprocess
 import os, sys
+import json
+from collections import Counter
+from multiprocessing import Pool
+
+from engine import play_game
 
 
 def show_match(bot, opponent_bot, map_num):
@@ -52,6 +57,53 @@ def test(bot, opponent_bot, map_num):
             break
 
 
+def bot_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def play_match(match):
+    bot, opponent_bot, map_num = match
+    result = play_game(bot, opponent_bot, 'maps/map' + str(map_num) + '.txt')
+    return {'bot': bot_name(bot), 'opponent': bot_name(opponent_bot), 'map': map_num,
+            'winner': result.winner, 'turns': result.turns, 'reason': result.reason}
+
+
+def tournament(bots, opponent_bots, maps, output='tournament.json', processes=None):
+    """
+        Plays every bot against every opponent on every map with the in-process engine, spread over all cores.
+        Prints a win/loss/draw/timeout/crash table and writes every game plus the totals to output as JSON.
+    """
+    matches = [(bot, opponent_bot, map_num) for bot in bots for opponent_bot in opponent_bots for map_num in maps]
+    print('Running tournament:', len(matches), 'games')
+    with Pool(processes) as pool:
+        games = list(pool.imap_unordered(play_match, matches, chunksize=4))
+    games.sort(key=lambda g: (g['bot'], g['opponent'], g['map']))
+
+    totals = {}
+    for game in games:
+        counts = totals.setdefault(game['bot'], {}).setdefault(game['opponent'], Counter())
+        if game['reason'] == 'draw':
+            counts['draws'] += 1
+        elif game['winner'] == 1:
+            counts['wins'] += 1
+        elif game['reason'] in ('timeout', 'crash'):
+            counts[game['reason'] + 's'] += 1
+        else:
+            counts['losses'] += 1
+
+    columns = ['wins', 'losses', 'draws', 'timeouts', 'crashes']
+    for bot, opponents in totals.items():
+        print()
+        print('%-20s' % bot + ''.join('%10s' % column for column in columns))
+        for opponent, counts in opponents.items():
+            print('%-20s' % ('  vs ' + opponent) + ''.join('%10d' % counts[column] for column in columns))
+
+    with open(output, 'w') as f:
+        json.dump({'totals': totals, 'games': games}, f, indent=1)
+    print()
+    print('Results written to', output)
+
+
 if __name__ == '__main__':
     path =  os.getcwd()
     opponents = ['opponent_bots/easy_bot.py',
@@ -63,6 +115,18 @@ if __name__ == '__main__':
     maps = [71, 13, 24, 56, 7]
 
     my_bot = 'behavior_tree_bot/bt_bot.py'
+    if len(sys.argv) >= 2 and sys.argv[1] == "tournament":
+        # python3 run.py tournament [map numbers...]  -- every opponent on every map (all 100 by default)
+        # python3 run.py tournament stratified <count> [feature]  -- count maps spread over a map_catalogue feature
+        if sys.argv[2:3] == ['stratified']:
+            from map_catalogue import load_catalogue, stratified
+            tournament_maps = stratified(load_catalogue(), int(sys.argv[3]), *sys.argv[4:5])
+            print('Maps:', ' '.join(map(str, tournament_maps)))
+        else:
+            tournament_maps = [int(arg) for arg in sys.argv[2:]] or list(range(1, 101))
+        tournament([my_bot], opponents, tournament_maps)
+        sys.exit(0)
+
     show = len(sys.argv) < 2 or sys.argv[1] == "show"
     for opponent, map in zip(opponents, maps):
         # use this command if you want to observe the bots
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+#
+# Uniform grid over planet positions for nearest-planet queries. Planets never move, so planet_wars.map_tables
+# builds one grid per map and every state on it shares it; owners do change, so queries take the current
+# planet records and filter on them. Radius queries use the sorted neighbor table instead
+# (PlanetWars.planets_within).
+
+from math import ceil, sqrt
+
+
+class SpatialIndex:
+    def __init__(self, planets, cell_size=None):
+        self.positions = [(p.x, p.y) for p in planets]
+        xs = [x for x, _ in self.positions] or [0.0]
+        ys = [y for _, y in self.positions] or [0.0]
+        self.x0, self.y0 = min(xs), min(ys)
+        width, height = max(xs) - self.x0, max(ys) - self.y0
+        if cell_size is None:
+            # About one planet per cell.
+            cell_size = sqrt(width * height / max(len(planets), 1)) or 1.0
+        self.cell_size = cell_size
+        self.cells = {}
+        for ID, (x, y) in enumerate(self.positions):
+            self.cells.setdefault(self.cell(x, y), []).append(ID)
+        # Beyond this many rings from any cell there is nothing left to visit.
+        self.max_ring = int(max(width, height) // cell_size) + 1
+
+    def cell(self, x, y):
+        return int((x - self.x0) // self.cell_size), int((y - self.y0) // self.cell_size)
+
+    def ring(self, cx, cy, r):
+        # Planet IDs in the cells at Chebyshev distance r from (cx, cy).
+        cells = self.cells
+        if r == 0:
+            return cells.get((cx, cy), ())
+        found = []
+        for x in range(cx - r, cx + r + 1):
+            found.extend(cells.get((x, cy - r), ()))
+            found.extend(cells.get((x, cy + r), ()))
+        for y in range(cy - r + 1, cy + r):
+            found.extend(cells.get((cx - r, y), ()))
+            found.extend(cells.get((cx + r, y), ()))
+        return found
+
+    def candidates(self, planets, planet_ID, owner, rings):
+        # (travel distance, ID) for the matching planets in the given rings around planet_ID. Distances are
+        # computed exactly like planet_wars.map_tables so results agree with state.distance.
+        x, y = self.positions[planet_ID]
+        cx, cy = self.cell(x, y)
+        positions = self.positions
+        for r in rings:
+            found = []
+            for ID in self.ring(cx, cy, r):
+                if ID != planet_ID and (owner is None or planets[ID].owner == owner):
+                    px, py = positions[ID]
+                    found.append((int(ceil(sqrt((x - px) ** 2 + (y - py) ** 2))), ID))
+            yield r, found
+
+    def nearest(self, planets, planet_ID, k=1, owner=None):
+        # Up to k planets closest to planet_ID (itself excluded), optionally only those of one owner, in
+        # (distance, ID) order: the same planets and order as sorting by state.distance.
+        found = []
+        for r, ring in self.candidates(planets, planet_ID, owner, range(self.max_ring + 1)):
+            found.extend(ring)
+            if len(found) >= k:
+                found.sort()
+                # Anything not visited yet is at least r cells' width away, so at a strictly larger distance.
+                if found[k - 1][0] < r * self.cell_size:
+                    break
+        found.sort()
+        return [planets[ID] for _, ID in found[:k]]